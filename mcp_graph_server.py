@@ -7,14 +7,185 @@ and SharePoint sites through the Microsoft Graph API.
 """
 
 import os
-import json
 import asyncio
-from typing import Any
+import random
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+from typing import Any, Awaitable, Callable, Iterable, Mapping, Optional, Sequence
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 import msal
 import httpx
+import orjson
+import fastjsonschema
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 support in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import uvloop  # faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
+
+# Graph accepts at most 20 sub-requests per $batch call
+BATCH_MAX_REQUESTS = 20
+# How long queued requests wait for others to join the same batch
+BATCH_WINDOW_SECONDS = 0.01
+# Cap on in-flight Graph requests, to stay clear of throttling
+MAX_CONCURRENT_REQUESTS = 16
+# Throttled (429) or unavailable (503) responses are retried this many times,
+# honouring Retry-After. Other 5xx responses (including 504) are retried with
+# backoff only for GETs, since a write that failed that way may have been applied.
+MAX_RETRIES = 3
+RETRY_STATUSES = (429, 503)
+# Pause new requests until the quota resets once less than this share remains
+RATE_LIMIT_LOW_FRACTION = 0.1
+# Seconds between keep_warm requests after the startup warm-up; unset or 0 turns
+# the repeating poll off. Keep it below the pool's 120s keep-alive expiry.
+KEEP_WARM_SECONDS = float(os.getenv("MICROSOFT_GRAPH_KEEP_WARM_SECONDS") or 0)
+# Number of GET responses remembered for conditional (If-None-Match) requests
+ETAG_CACHE_SIZE = 256
+# Indent tool output for humans; compact JSON is smaller and faster to produce
+PRETTY_JSON = os.getenv("MCP_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+_JSON_OPTIONS = orjson.OPT_INDENT_2 if PRETTY_JSON else 0
+
+# $search expression used by search_user; {t} is the escaped search term
+_SEARCH_USERS = '"displayName:{t}" OR "userPrincipalName:{t}"'
+# Advanced directory queries ($search, $count) require eventual consistency
+_EVENTUAL_CONSISTENCY = {"ConsistencyLevel": "eventual"}
+# Ask Graph for the largest page size an endpoint supports when paging
+_MAX_PAGE_SIZE = {"Prefer": "odata.maxpagesize=999"}
+# Input schema for the optional "fields" argument of get/list tools
+_FIELDS_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string"},
+    "description": "Properties to return (optional); fewer fields give smaller responses"
+}
+# Shared empty list for request bodies; only ever read by the serializer
+_EMPTY_LIST: list = []
+# Prefix of the @odata.id reference used to add a directory object to a group
+_DIRECTORY_OBJECTS_URL = "https://graph.microsoft.com/v1.0/directoryObjects/"
+# SharePoint permission roles accepted by add_site_permission
+_SITE_ROLES = {
+    "read": ("read",),
+    "write": ("write",),
+    "owner": ("owner",)
+}
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Exception = None):
+    """Complete a future unless its caller has already gone away"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _escape_search(term: str) -> str:
+    """Escape a term for use inside a quoted $search phrase"""
+    return term.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _escape(value: str) -> str:
+    """Percent-encode a value used as a single URL path segment"""
+    return quote(value, safe="")
+
+
+def _escape_site_id(site_id: str) -> str:
+    """
+    Percent-encode a SharePoint site ID for use in a URL path.
+    
+    Composite IDs ("host,guid,guid") and path-style IDs ("host:/sites/name")
+    keep their separators so Graph can still parse them.
+    """
+    return quote(site_id, safe=",:/")
+
+
+def _license_body(sku_id: str, disabled_plans: Sequence[str]) -> dict:
+    """Request body for assignLicense that adds a single SKU"""
+    return {
+        "addLicenses": [
+            {
+                "skuId": sku_id,
+                "disabledPlans": list(disabled_plans) if disabled_plans else _EMPTY_LIST
+            }
+        ],
+        "removeLicenses": _EMPTY_LIST
+    }
+
+
+def _select(fields: Optional[Sequence[str]], default: str = None) -> dict:
+    """$select query parameter for the requested fields, or the default projection"""
+    if fields:
+        return {"$select": ",".join(fields)}
+    if default:
+        return {"$select": default}
+    return {}
+
+
+def _is_retryable(status: int, method: str) -> bool:
+    """Whether a failed request can safely be sent again"""
+    return status in RETRY_STATUSES or (status >= 500 and method == "GET")
+
+
+def _retry_delay(headers: Mapping, default: float = 1.0) -> float:
+    """Seconds to wait before retrying, from the Retry-After header when present"""
+    try:
+        return float(headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
+
+def _batch_error(response: dict) -> str:
+    """Error message carried by a failed $batch sub-response"""
+    body = response.get("body") or {}
+    return body.get("error", {}).get("message", "Unknown error")
+
+
+def _batch_failure(error: Exception) -> dict:
+    """Stand-in sub-response for a request whose whole $batch call failed"""
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            body = orjson.loads(error.response.content)
+        except orjson.JSONDecodeError:
+            body = {"error": {"message": str(error)}}
+        return {"status": error.response.status_code, "body": body}
+    return {"status": 500, "body": {"error": {"message": str(error)}}}
+
+
+def _batch_result(response: dict, parse: bool = True) -> dict:
+    """Unwrap a $batch sub-response the way _make_request unwraps a response"""
+    status = response.get("status", 500)
+    if status >= 400:
+        raise Exception(f"Graph request failed ({status}): {_batch_error(response)}")
+    if not parse:
+        return {"status": status}
+    if status == 204 or not response.get("body"):
+        return {"success": True}
+    return response["body"]
+
+
+def _batch_summary(keys: Sequence[str], responses: list) -> dict:
+    """Per-item outcome of a bulk operation, keyed by the caller's IDs"""
+    results = []
+    for key, response in zip(keys, responses):
+        status = response.get("status", 500)
+        entry = {"id": key, "status": status}
+        if status >= 400:
+            entry["error"] = _batch_error(response)
+        elif response.get("body"):
+            entry["result"] = response["body"]
+        results.append(entry)
+    return {"results": results}
 
 
 class GraphAPIClient:
@@ -35,59 +206,392 @@ class GraphAPIClient:
         self.scope = ["https://graph.microsoft.com/.default"]
         self.graph_endpoint = "https://graph.microsoft.com/v1.0"
         
+        # Optionally persist MSAL's token cache so a restart can reuse a valid token
+        self.token_cache_path = os.path.expanduser(os.getenv("MICROSOFT_TOKEN_CACHE_PATH", ""))
+        self.token_cache = msal.SerializableTokenCache()
+        if self.token_cache_path and os.path.exists(self.token_cache_path):
+            try:
+                with open(self.token_cache_path) as f:
+                    self.token_cache.deserialize(f.read())
+            except (OSError, ValueError):
+                # Unreadable or corrupt (e.g. truncated) cache: start empty, it is rewritten
+                # on the next token acquisition
+                self.token_cache = msal.SerializableTokenCache()
+        
         self.app = msal.ConfidentialClientApplication(
             self.client_id,
             authority=self.authority,
-            client_credential=self.client_secret
+            client_credential=self.client_secret,
+            token_cache=self.token_cache
         )
-        self._token = None
+        self._token: Optional[str] = None
+        self._token_refresh_at: float = 0.0
+        self._token_lock = asyncio.Lock()
+        # Sent with every request; only the Authorization value changes, on token refresh
+        self._headers = {
+            "Authorization": "",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        
+        # Shared HTTP client so connections (and TLS sessions) are reused across calls.
+        # With HTTP/2, concurrent requests are multiplexed over a single connection.
+        # Idle connections are kept for two minutes (httpx defaults to 5 seconds) so
+        # that tool calls spaced out by a conversation still find a warm connection.
+        self._client = httpx.AsyncClient(
+            base_url=self.graph_endpoint,
+            limits=httpx.Limits(
+                max_connections=64,
+                max_keepalive_connections=32,
+                keepalive_expiry=120
+            ),
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(30.0)
+        )
+        
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # Set from RateLimit-* response headers when the quota is nearly used up
+        self._throttled_until: float = 0.0
+        
+        # Last ETag and body per GET request, most recently used last
+        self._etag_cache: OrderedDict = OrderedDict()
+        
+        # Requests queued by _submit, waiting to be sent as one $batch call
+        self._pending: list = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: set = set()
+    
+    async def keep_warm(self, interval: float = KEEP_WARM_SECONDS):
+        """
+        Make a cheap request to prime the token cache and connection pool. With a
+        positive interval, repeat it every interval seconds so the token stays cached
+        and the pooled connection stays open between tool calls.
+        """
+        while True:
+            try:
+                await self._make_request(
+                    "GET", "organization", params={"$select": "id"}, parse=False
+                )
+            except Exception:
+                # Tool calls report connectivity and auth errors themselves
+                pass
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+    
+    async def aclose(self):
+        """Close the underlying HTTP connection pool"""
+        if self._pending:
+            self._flush_pending()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await self._client.aclose()
+    
+    def _token_is_fresh(self) -> bool:
+        """Whether the cached token can be used without asking MSAL for a new one"""
+        return self._token is not None and time.monotonic() < self._token_refresh_at
+    
+    def _save_token_cache(self):
+        """
+        Atomically replace the cache file, so a kill mid-write can't leave it corrupt.
+        
+        The cache holds bearer tokens; mkstemp creates the file readable only by its owner.
+        """
+        directory = os.path.dirname(os.path.abspath(self.token_cache_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token_cache-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.token_cache.serialize())
+            os.replace(tmp_path, self.token_cache_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _acquire_token(self) -> dict:
+        """Get a token from MSAL (its cache first, then the network) and persist the cache"""
+        result = self.app.acquire_token_for_client(scopes=self.scope)
+        
+        if self.token_cache_path and self.token_cache.has_state_changed:
+            try:
+                self._save_token_cache()
+                self.token_cache.has_state_changed = False
+            except Exception:
+                # Persisting is an optimization; the token itself is still usable
+                pass
+        
+        return result
     
     async def get_token(self) -> str:
         """Get or refresh access token"""
-        result = self.app.acquire_token_silent(self.scope, account=None)
-        if not result:
-            result = self.app.acquire_token_for_client(scopes=self.scope)
-        
-        if "access_token" in result:
-            self._token = result["access_token"]
+        if self._token_is_fresh():
             return self._token
-        else:
-            raise Exception(f"Failed to acquire token: {result.get('error_description')}")
+        
+        async with self._token_lock:
+            # Another caller may have refreshed the token while we waited
+            if self._token_is_fresh():
+                return self._token
+            
+            requested_at = time.monotonic()
+            # MSAL does blocking network I/O, so keep it off the event loop
+            result = await asyncio.to_thread(self._acquire_token)
+            
+            if "access_token" in result:
+                self._token = result["access_token"]
+                self._headers["Authorization"] = "Bearer " + self._token
+                # Refresh a minute before expiry, or earlier if MSAL suggests it (refresh_in)
+                refresh_after = int(result.get("expires_in", 3599)) - 60
+                if "refresh_in" in result:
+                    refresh_after = min(refresh_after, int(result["refresh_in"]))
+                self._token_refresh_at = requested_at + refresh_after
+                return self._token
+            else:
+                raise Exception(f"Failed to acquire token: {result.get('error_description')}")
     
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
-        data: dict = None
+        data: dict = None,
+        params: dict = None,
+        headers: dict = None,
+        parse: bool = True
     ) -> dict:
-        """Make authenticated request to Graph API"""
-        token = await self.get_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        """
+        Make authenticated request to Graph API.
         
-        url = f"{self.graph_endpoint}/{endpoint}"
-        
-        async with httpx.AsyncClient() as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "PATCH":
-                response = await client.patch(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
+        With parse=False the response body is not decoded and only the status
+        code is returned, for callers that discard the body anyway.
+        """
+        await self.get_token()
+        
+        cache_key = None
+        cached = None
+        if method == "GET":
+            cache_key = (endpoint, tuple(sorted(params.items())) if params else None)
+            cached = self._etag_cache.get(cache_key)
+            if cached is not None:
+                headers = {**(headers or {}), "If-None-Match": cached[0]}
+        
+        request_headers = {**self._headers, **headers} if headers else self._headers
+        content = orjson.dumps(data) if data is not None else None
+        
+        for attempt in range(MAX_RETRIES + 1):
+            pause = self._throttled_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
             
-            response.raise_for_status()
+            async with self._semaphore:
+                response = await self._client.request(
+                    method,
+                    endpoint,
+                    headers=request_headers,
+                    params=params,
+                    content=content
+                )
+            self._note_rate_limit(response)
+            
+            status = response.status_code
+            if attempt == MAX_RETRIES or not _is_retryable(status, method):
+                break
+            if status in RETRY_STATUSES:
+                delay = _retry_delay(response.headers)
+            else:
+                delay = _retry_delay(response.headers, default=0.25 * 2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, 0.25))
+        
+        if response.status_code == 304 and cached is not None:
+            self._etag_cache.move_to_end(cache_key)
+            return cached[1]
+        
+        response.raise_for_status()
+        
+        if not parse:
+            return {"status": response.status_code}
+        
+        # Some endpoints return 204 No Content
+        if response.status_code == 204:
+            return {"success": True}
+        
+        result = orjson.loads(response.content)
+        
+        etag = response.headers.get("ETag")
+        if cache_key is not None and etag:
+            self._etag_cache[cache_key] = (etag, result)
+            self._etag_cache.move_to_end(cache_key)
+            if len(self._etag_cache) > ETAG_CACHE_SIZE:
+                self._etag_cache.popitem(last=False)
+        
+        return result
+    
+    def _note_rate_limit(self, response: httpx.Response):
+        """Hold back new requests when Graph reports the rate-limit quota is nearly used"""
+        remaining = response.headers.get("RateLimit-Remaining")
+        limit = response.headers.get("RateLimit-Limit")
+        reset = response.headers.get("RateLimit-Reset")
+        if remaining is None or limit is None or reset is None:
+            return
+        try:
+            if int(remaining) < int(limit) * RATE_LIMIT_LOW_FRACTION:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + int(reset))
+        except ValueError:
+            pass
+    
+    async def _get_all(self, endpoint: str, params: dict = None, limit: int = None) -> dict:
+        """
+        GET a collection, following @odata.nextLink until every page is collected.
+        
+        Pages are requested at the largest size Graph allows. If limit is given,
+        paging stops once that many items have been collected.
+        """
+        page = await self._make_request("GET", endpoint, params=params, headers=_MAX_PAGE_SIZE)
+        # Copy so that extending doesn't modify a cached page
+        items = list(page.get("value", []))
+        
+        # nextLink is an absolute URL that already carries the query options
+        while "@odata.nextLink" in page and (limit is None or len(items) < limit):
+            page = await self._make_request(
+                "GET", page["@odata.nextLink"], headers=_MAX_PAGE_SIZE
+            )
+            items.extend(page.get("value", []))
+        
+        return {"value": items[:limit] if limit is not None else items}
+    
+    async def _submit(
+        self,
+        method: str,
+        endpoint: str,
+        data: dict = None,
+        parse: bool = True
+    ) -> dict:
+        """
+        Queue a request to be coalesced with concurrent ones into a $batch call.
+        
+        Requests submitted within BATCH_WINDOW_SECONDS of each other share a
+        single round trip; a lone request is sent through _make_request as usual.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((method, endpoint, data, parse, future))
+        
+        if len(self._pending) >= BATCH_MAX_REQUESTS:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(BATCH_WINDOW_SECONDS, self._flush_pending)
+        
+        return await future
+    
+    def _flush_pending(self):
+        """Send all queued requests"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        pending, self._pending = self._pending, []
+        task = asyncio.create_task(self._send_batch(pending))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _send_batch(self, entries: list):
+        """Send queued requests and resolve each caller's future with its response"""
+        if len(entries) == 1:
+            method, endpoint, data, parse, future = entries[0]
+            try:
+                result = await self._make_request(method, endpoint, data, parse=parse)
+                _resolve(future, result=result)
+            except Exception as e:
+                _resolve(future, error=e)
+            return
+        
+        try:
+            responses = await self._batch([
+                {"method": method, "url": endpoint, "body": data}
+                for method, endpoint, data, _, _ in entries
+            ])
+        except Exception as e:
+            for *_, future in entries:
+                _resolve(future, error=e)
+            return
+        
+        for (*_, parse, future), response in zip(entries, responses):
+            try:
+                _resolve(future, result=_batch_result(response, parse))
+            except Exception as e:
+                _resolve(future, error=e)
+    
+    async def _gather(self, coros: Iterable[Awaitable]) -> list:
+        """
+        Run client calls concurrently, for work that can't be expressed as $batch.
+        
+        Concurrency is bounded by the request semaphore in _make_request. Failures
+        are returned in place of results rather than raised.
+        """
+        return await asyncio.gather(*coros, return_exceptions=True)
+    
+    async def _batch(self, requests: list) -> list:
+        """
+        Send requests through Graph's $batch endpoint.
+        
+        Each request is a dict with "method", "url" (relative to the API root, like
+        the endpoints passed to _make_request) and an optional "body". Requests are
+        split into chunks of BATCH_MAX_REQUESTS that are sent concurrently. Returns
+        the raw sub-responses in the order the requests were given. If a whole
+        $batch call fails, each of its requests gets an error sub-response, so the
+        other chunks' results are still reported.
+        """
+        chunks = [
+            requests[i:i + BATCH_MAX_REQUESTS]
+            for i in range(0, len(requests), BATCH_MAX_REQUESTS)
+        ]
+        results = await asyncio.gather(
+            *(self._batch_chunk(chunk) for chunk in chunks), return_exceptions=True
+        )
+        
+        responses = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                responses.extend(_batch_failure(result) for _ in chunk)
+            else:
+                responses.extend(result)
+        return responses
+    
+    async def _batch_chunk(self, requests: list) -> list:
+        """Send one $batch call, retrying sub-requests that were throttled"""
+        responses: list = [None] * len(requests)
+        todo = range(len(requests))
+        
+        for attempt in range(MAX_RETRIES + 1):
+            batch = []
+            for i in todo:
+                request = requests[i]
+                entry = {"id": str(i), "method": request["method"], "url": f"/{request['url']}"}
+                if request.get("body") is not None:
+                    entry["body"] = request["body"]
+                    entry["headers"] = {"Content-Type": "application/json"}
+                batch.append(entry)
             
-            # Some endpoints return 204 No Content
-            if response.status_code == 204:
-                return {"success": True}
+            result = await self._make_request("POST", "$batch", {"requests": batch})
+            for response in result.get("responses", []):
+                responses[int(response["id"])] = response
             
-            return response.json()
+            throttled = [
+                i for i in todo
+                if responses[i] is not None
+                and _is_retryable(responses[i].get("status", 500), requests[i]["method"])
+            ]
+            if not throttled or attempt == MAX_RETRIES:
+                break
+            delay = max(
+                _retry_delay(responses[i].get("headers") or {}, default=2.0 ** attempt)
+                for i in throttled
+            )
+            await asyncio.sleep(delay + random.uniform(0, 0.25))
+            todo = throttled
+        
+        missing = {"status": 500, "body": {"error": {"message": "No response returned"}}}
+        return [response or missing for response in responses]
     
     # ==================== USER OPERATIONS ====================
     
@@ -112,28 +616,20 @@ class GraphAPIClient:
             }
         }
         
-        return await self._make_request("POST", "users", user_data)
+        return await self._submit("POST", "users", user_data)
     
     async def assign_license(
         self,
         user_id: str,
         sku_id: str,
-        disabled_plans: list = None
+        disabled_plans: Sequence[str] = ()
     ) -> dict:
         """Assign a license to a user"""
-        license_data = {
-            "addLicenses": [
-                {
-                    "skuId": sku_id,
-                    "disabledPlans": disabled_plans or []
-                }
-            ],
-            "removeLicenses": []
-        }
+        license_data = _license_body(sku_id, disabled_plans)
         
-        return await self._make_request(
+        return await self._submit(
             "POST",
-            f"users/{user_id}/assignLicense",
+            f"users/{_escape(user_id)}/assignLicense",
             license_data
         )
     
@@ -144,13 +640,14 @@ class GraphAPIClient:
     ) -> dict:
         """Add a user to a group"""
         member_data = {
-            "@odata.id": f"https://graph.microsoft.com/v1.0/directoryObjects/{user_id}"
+            "@odata.id": _DIRECTORY_OBJECTS_URL + _escape(user_id)
         }
         
-        return await self._make_request(
+        return await self._submit(
             "POST",
-            f"groups/{group_id}/members/$ref",
-            member_data
+            f"groups/{_escape(group_id)}/members/$ref",
+            member_data,
+            parse=False
         )
     
     async def remove_user_from_group(
@@ -159,73 +656,136 @@ class GraphAPIClient:
         group_id: str
     ) -> dict:
         """Remove a user from a group"""
-        return await self._make_request(
+        return await self._submit(
             "DELETE",
-            f"groups/{group_id}/members/{user_id}/$ref"
+            f"groups/{_escape(group_id)}/members/{_escape(user_id)}/$ref",
+            parse=False
         )
     
+    async def bulk_add_users_to_group(self, group_id: str, user_ids: Sequence[str]) -> dict:
+        """Add many users to a group using $batch"""
+        responses = await self._batch([
+            {
+                "method": "POST",
+                "url": f"groups/{_escape(group_id)}/members/$ref",
+                "body": {"@odata.id": _DIRECTORY_OBJECTS_URL + _escape(user_id)}
+            }
+            for user_id in user_ids
+        ])
+        return _batch_summary(user_ids, responses)
+    
+    async def bulk_get_users(self, user_ids: Sequence[str]) -> dict:
+        """Get details for many users using $batch"""
+        responses = await self._batch([
+            {"method": "GET", "url": f"users/{_escape(user_id)}"} for user_id in user_ids
+        ])
+        return _batch_summary(user_ids, responses)
+    
+    async def bulk_assign_licenses(
+        self,
+        user_ids: Sequence[str],
+        sku_id: str,
+        disabled_plans: Sequence[str] = ()
+    ) -> dict:
+        """Assign the same license to many users using $batch"""
+        license_data = _license_body(sku_id, disabled_plans)
+        responses = await self._batch([
+            {
+                "method": "POST",
+                "url": f"users/{_escape(user_id)}/assignLicense",
+                "body": license_data
+            }
+            for user_id in user_ids
+        ])
+        return _batch_summary(user_ids, responses)
+    
     async def list_available_licenses(self) -> dict:
         """List all available licenses in the tenant"""
-        return await self._make_request("GET", "subscribedSkus")
+        return await self._get_all("subscribedSkus")
     
     async def list_groups(self) -> dict:
         """List all groups in the tenant"""
-        return await self._make_request("GET", "groups?$select=id,displayName,description,groupTypes,mail")
+        return await self._get_all(
+            "groups",
+            params={"$select": "id,displayName,description,groupTypes,mail", "$top": "999"}
+        )
     
-    async def get_group_members(self, group_id: str) -> dict:
+    async def get_group_members(self, group_id: str, fields: Sequence[str] = None) -> dict:
         """Get members of a group"""
-        return await self._make_request("GET", f"groups/{group_id}/members?$select=id,displayName,userPrincipalName")
+        return await self._get_all(
+            f"groups/{_escape(group_id)}/members",
+            params={**_select(fields, "id,displayName,userPrincipalName"), "$top": "999"}
+        )
+    
+    async def bulk_get_group_members(self, group_ids: Sequence[str]) -> dict:
+        """Get members of many groups concurrently"""
+        results = await self._gather(self.get_group_members(group_id) for group_id in group_ids)
+        return {
+            "results": [
+                {"id": group_id, "error": str(result)}
+                if isinstance(result, Exception)
+                else {"id": group_id, "result": result}
+                for group_id, result in zip(group_ids, results)
+            ]
+        }
     
-    async def get_user(self, user_id: str) -> dict:
+    async def get_user(self, user_id: str, fields: Sequence[str] = None) -> dict:
         """Get user details"""
-        return await self._make_request("GET", f"users/{user_id}")
+        return await self._make_request(
+            "GET", f"users/{_escape(user_id)}", params=_select(fields) or None
+        )
     
     async def search_user(self, search_term: str) -> dict:
         """Search for users by display name or email"""
-        filter_query = f"startswith(displayName,'{search_term}') or startswith(userPrincipalName,'{search_term}')"
         return await self._make_request(
             "GET",
-            f"users?$filter={filter_query}"
+            "users",
+            params={
+                "$search": _SEARCH_USERS.format(t=_escape_search(search_term)),
+                "$top": "25",
+                "$count": "true"
+            },
+            headers=_EVENTUAL_CONSISTENCY
         )
     
-    async def list_users(self, top: int = 100) -> dict:
+    async def list_users(self, top: int = 100, fields: Sequence[str] = None) -> dict:
         """List all users in the tenant"""
-        return await self._make_request(
-            "GET",
-            f"users?$select=id,displayName,userPrincipalName,mail,jobTitle&$top={top}"
+        return await self._get_all(
+            "users",
+            params={
+                **_select(fields, "id,displayName,userPrincipalName,mail,jobTitle"),
+                "$top": str(min(top, 999))
+            },
+            limit=top
         )
     
     # ==================== SHAREPOINT OPERATIONS ====================
     
-    async def list_sites(self, search: str = None) -> dict:
+    async def list_sites(self, search: str = None, fields: Sequence[str] = None) -> dict:
         """List SharePoint sites. Optionally search by name."""
+        params = _select(fields, "id,name,displayName,webUrl")
         if search:
-            return await self._make_request(
-                "GET",
-                f"sites?search={search}&$select=id,name,displayName,webUrl"
-            )
-        return await self._make_request(
-            "GET",
-            "sites?$select=id,name,displayName,webUrl"
-        )
+            params["search"] = search
+        return await self._get_all("sites", params=params)
     
     async def get_site(self, site_id: str) -> dict:
         """Get a SharePoint site by ID or path (e.g., 'contoso.sharepoint.com:/sites/marketing')"""
-        # Handle site path format
-        if ".sharepoint.com:" in site_id or "/" in site_id:
-            return await self._make_request("GET", f"sites/{site_id}")
-        return await self._make_request("GET", f"sites/{site_id}")
+        return await self._make_request("GET", f"sites/{_escape_site_id(site_id)}")
     
     async def get_site_by_url(self, hostname: str, site_path: str) -> dict:
         """Get a SharePoint site by hostname and path"""
         return await self._make_request(
             "GET",
-            f"sites/{hostname}:/{site_path}"
+            f"sites/{_escape(hostname)}:/{quote(site_path, safe='/')}"
         )
     
-    async def list_site_permissions(self, site_id: str) -> dict:
+    async def list_site_permissions(self, site_id: str, fields: Sequence[str] = None) -> dict:
         """List permissions on a SharePoint site"""
-        return await self._make_request("GET", f"sites/{site_id}/permissions")
+        return await self._make_request(
+            "GET",
+            f"sites/{_escape_site_id(site_id)}/permissions",
+            params=_select(fields) or None
+        )
     
     async def add_site_permission(
         self,
@@ -238,14 +798,8 @@ class GraphAPIClient:
         
         Roles: read, write, owner
         """
-        roles_map = {
-            "read": ["read"],
-            "write": ["write"],
-            "owner": ["owner"]
-        }
-        
         permission_data = {
-            "roles": roles_map.get(role, ["write"]),
+            "roles": _SITE_ROLES.get(role, _SITE_ROLES["write"]),
             "grantedToIdentities": [
                 {
                     "application": None,
@@ -256,31 +810,32 @@ class GraphAPIClient:
             ]
         }
         
-        return await self._make_request(
+        return await self._submit(
             "POST",
-            f"sites/{site_id}/permissions",
+            f"sites/{_escape_site_id(site_id)}/permissions",
             permission_data
         )
     
     async def remove_site_permission(self, site_id: str, permission_id: str) -> dict:
         """Remove a permission from a SharePoint site"""
-        return await self._make_request(
+        return await self._submit(
             "DELETE",
-            f"sites/{site_id}/permissions/{permission_id}"
+            f"sites/{_escape_site_id(site_id)}/permissions/{_escape(permission_id)}",
+            parse=False
         )
     
-    async def list_site_drives(self, site_id: str) -> dict:
+    async def list_site_drives(self, site_id: str, fields: Sequence[str] = None) -> dict:
         """List document libraries (drives) in a SharePoint site"""
-        return await self._make_request(
-            "GET",
-            f"sites/{site_id}/drives?$select=id,name,webUrl"
+        return await self._get_all(
+            f"sites/{_escape_site_id(site_id)}/drives",
+            params=_select(fields, "id,name,webUrl")
         )
     
-    async def list_site_lists(self, site_id: str) -> dict:
+    async def list_site_lists(self, site_id: str, fields: Sequence[str] = None) -> dict:
         """List all lists in a SharePoint site"""
-        return await self._make_request(
-            "GET",
-            f"sites/{site_id}/lists?$select=id,name,displayName,webUrl"
+        return await self._get_all(
+            f"sites/{_escape_site_id(site_id)}/lists",
+            params=_select(fields, "id,name,displayName,webUrl")
         )
     
     async def get_root_site(self) -> dict:
@@ -288,531 +843,522 @@ class GraphAPIClient:
         return await self._make_request("GET", "sites/root")
 
 
+def _dumps(result: Any) -> str:
+    """Serialize a Graph response for a tool result"""
+    return orjson.dumps(result, option=_JSON_OPTIONS).decode()
+
+
+def _ok(label: str, result: Any) -> list[TextContent]:
+    """Format a successful tool result as a labelled JSON payload"""
+    return [TextContent(type="text", text=f"{label}:\n{_dumps(result)}")]
+
+
 # Initialize the MCP server
 app = Server("microsoft-graph-mcp")
 graph_client = GraphAPIClient()
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools"""
-    return [
-        # ==================== USER TOOLS ====================
-        Tool(
-            name="create_user",
-            description="Create a new user in Microsoft 365",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "display_name": {
-                        "type": "string",
-                        "description": "The display name for the user"
-                    },
-                    "user_principal_name": {
-                        "type": "string",
-                        "description": "The user principal name (email format, e.g., user@domain.com)"
-                    },
-                    "mail_nickname": {
-                        "type": "string",
-                        "description": "The mail alias for the user"
-                    },
-                    "password": {
-                        "type": "string",
-                        "description": "The initial password for the user"
-                    },
-                    "account_enabled": {
-                        "type": "boolean",
-                        "description": "Whether the account is enabled",
-                        "default": True
-                    },
-                    "force_change_password": {
-                        "type": "boolean",
-                        "description": "Whether user must change password on first login",
-                        "default": True
-                    }
+# Tool definitions are constant, so build them once rather than per tools/list request
+_TOOLS: list[Tool] = [
+    # ==================== USER TOOLS ====================
+    Tool(
+        name="create_user",
+        description="Create a new user in Microsoft 365",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "display_name": {
+                    "type": "string",
+                    "description": "The display name for the user"
                 },
-                "required": ["display_name", "user_principal_name", "mail_nickname", "password"]
-            }
-        ),
-        Tool(
-            name="assign_license",
-            description="Assign a license to a user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID or user principal name"
-                    },
-                    "sku_id": {
-                        "type": "string",
-                        "description": "The SKU ID of the license to assign"
-                    },
-                    "disabled_plans": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "List of service plan IDs to disable (optional)",
-                        "default": []
-                    }
+                "user_principal_name": {
+                    "type": "string",
+                    "description": "The user principal name (email format, e.g., user@domain.com)"
                 },
-                "required": ["user_id", "sku_id"]
-            }
-        ),
-        Tool(
-            name="add_user_to_group",
-            description="Add a user to a group (also grants access to group-connected SharePoint sites)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID or user principal name"
-                    },
-                    "group_id": {
-                        "type": "string",
-                        "description": "The group ID"
-                    }
+                "mail_nickname": {
+                    "type": "string",
+                    "description": "The mail alias for the user"
                 },
-                "required": ["user_id", "group_id"]
-            }
-        ),
-        Tool(
-            name="remove_user_from_group",
-            description="Remove a user from a group",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID"
-                    },
-                    "group_id": {
-                        "type": "string",
-                        "description": "The group ID"
-                    }
+                "password": {
+                    "type": "string",
+                    "description": "The initial password for the user"
                 },
-                "required": ["user_id", "group_id"]
-            }
-        ),
-        Tool(
-            name="list_available_licenses",
-            description="List all available licenses (SKUs) in the tenant",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        Tool(
-            name="list_groups",
-            description="List all groups in the tenant",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        Tool(
-            name="get_group_members",
-            description="Get all members of a group",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "group_id": {
-                        "type": "string",
-                        "description": "The group ID"
-                    }
+                "account_enabled": {
+                    "type": "boolean",
+                    "description": "Whether the account is enabled",
+                    "default": True
                 },
-                "required": ["group_id"]
-            }
-        ),
-        Tool(
-            name="get_user",
-            description="Get details for a specific user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID or user principal name"
-                    }
+                "force_change_password": {
+                    "type": "boolean",
+                    "description": "Whether user must change password on first login",
+                    "default": True
+                }
+            },
+            "required": ["display_name", "user_principal_name", "mail_nickname", "password"]
+        }
+    ),
+    Tool(
+        name="assign_license",
+        description="Assign a license to a user",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_id": {
+                    "type": "string",
+                    "description": "The user ID or user principal name"
                 },
-                "required": ["user_id"]
-            }
-        ),
-        Tool(
-            name="search_user",
-            description="Search for users by display name or email",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "search_term": {
-                        "type": "string",
-                        "description": "The search term to look for in display names or emails"
-                    }
+                "sku_id": {
+                    "type": "string",
+                    "description": "The SKU ID of the license to assign"
                 },
-                "required": ["search_term"]
-            }
-        ),
-        Tool(
-            name="list_users",
-            description="List all users in the tenant",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "top": {
-                        "type": "integer",
-                        "description": "Maximum number of users to return",
-                        "default": 100
-                    }
+                "disabled_plans": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of service plan IDs to disable (optional)",
+                    "default": []
                 }
-            }
-        ),
-        # ==================== SHAREPOINT TOOLS ====================
-        Tool(
-            name="list_sites",
-            description="List SharePoint sites in the tenant. Optionally search by name.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "search": {
-                        "type": "string",
-                        "description": "Optional search term to filter sites by name"
-                    }
+            },
+            "required": ["user_id", "sku_id"]
+        }
+    ),
+    Tool(
+        name="add_user_to_group",
+        description="Add a user to a group (also grants access to group-connected SharePoint sites)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_id": {
+                    "type": "string",
+                    "description": "The user ID or user principal name"
+                },
+                "group_id": {
+                    "type": "string",
+                    "description": "The group ID"
                 }
-            }
-        ),
-        Tool(
-            name="get_site",
-            description="Get details for a specific SharePoint site by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    }
+            },
+            "required": ["user_id", "group_id"]
+        }
+    ),
+    Tool(
+        name="remove_user_from_group",
+        description="Remove a user from a group",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_id": {
+                    "type": "string",
+                    "description": "The user ID"
                 },
-                "required": ["site_id"]
-            }
-        ),
-        Tool(
-            name="get_site_by_url",
-            description="Get a SharePoint site by hostname and path",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "hostname": {
-                        "type": "string",
-                        "description": "The SharePoint hostname (e.g., contoso.sharepoint.com)"
-                    },
-                    "site_path": {
-                        "type": "string",
-                        "description": "The site path (e.g., sites/marketing)"
-                    }
+                "group_id": {
+                    "type": "string",
+                    "description": "The group ID"
+                }
+            },
+            "required": ["user_id", "group_id"]
+        }
+    ),
+    Tool(
+        name="list_available_licenses",
+        description="List all available licenses (SKUs) in the tenant",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="list_groups",
+        description="List all groups in the tenant",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="get_group_members",
+        description="Get all members of a group",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "group_id": {
+                    "type": "string",
+                    "description": "The group ID"
                 },
-                "required": ["hostname", "site_path"]
-            }
-        ),
-        Tool(
-            name="get_root_site",
-            description="Get the root SharePoint site for the tenant",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        Tool(
-            name="list_site_permissions",
-            description="List all permissions on a SharePoint site",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    }
+                "fields": _FIELDS_SCHEMA
+            },
+            "required": ["group_id"]
+        }
+    ),
+    Tool(
+        name="bulk_get_group_members",
+        description="Get the members of multiple groups",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "group_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The group IDs"
+                }
+            },
+            "required": ["group_ids"]
+        }
+    ),
+    Tool(
+        name="get_user",
+        description="Get details for a specific user",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_id": {
+                    "type": "string",
+                    "description": "The user ID or user principal name"
                 },
-                "required": ["site_id"]
-            }
-        ),
-        Tool(
-            name="add_site_permission",
-            description="Add a user permission to a SharePoint site",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    },
-                    "user_id": {
-                        "type": "string",
-                        "description": "The user ID to grant access"
-                    },
-                    "role": {
-                        "type": "string",
-                        "enum": ["read", "write", "owner"],
-                        "description": "The permission level: read, write, or owner",
-                        "default": "write"
-                    }
+                "fields": _FIELDS_SCHEMA
+            },
+            "required": ["user_id"]
+        }
+    ),
+    Tool(
+        name="search_user",
+        description="Search for users by display name or email",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "search_term": {
+                    "type": "string",
+                    "description": "The search term to look for in display names or emails"
+                }
+            },
+            "required": ["search_term"]
+        }
+    ),
+    Tool(
+        name="list_users",
+        description="List all users in the tenant",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "top": {
+                    "type": "integer",
+                    "description": "Maximum number of users to return",
+                    "default": 100
                 },
-                "required": ["site_id", "user_id"]
+                "fields": _FIELDS_SCHEMA
             }
-        ),
-        Tool(
-            name="remove_site_permission",
-            description="Remove a permission from a SharePoint site",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    },
-                    "permission_id": {
-                        "type": "string",
-                        "description": "The permission ID to remove"
-                    }
+        }
+    ),
+    Tool(
+        name="bulk_add_users_to_group",
+        description="Add multiple users to a group in as few requests as possible",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "group_id": {
+                    "type": "string",
+                    "description": "The group ID"
                 },
-                "required": ["site_id", "permission_id"]
-            }
-        ),
-        Tool(
-            name="list_site_drives",
-            description="List document libraries in a SharePoint site",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    }
+                "user_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The user IDs to add"
+                }
+            },
+            "required": ["group_id", "user_ids"]
+        }
+    ),
+    Tool(
+        name="bulk_get_users",
+        description="Get details for multiple users in as few requests as possible",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The user IDs or user principal names"
+                }
+            },
+            "required": ["user_ids"]
+        }
+    ),
+    Tool(
+        name="bulk_assign_licenses",
+        description="Assign a license to multiple users in as few requests as possible",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The user IDs or user principal names"
                 },
-                "required": ["site_id"]
-            }
-        ),
-        Tool(
-            name="list_site_lists",
-            description="List all lists in a SharePoint site",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "site_id": {
-                        "type": "string",
-                        "description": "The site ID"
-                    }
+                "sku_id": {
+                    "type": "string",
+                    "description": "The SKU ID of the license to assign"
+                },
+                "disabled_plans": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of service plan IDs to disable (optional)",
+                    "default": []
+                }
+            },
+            "required": ["user_ids", "sku_id"]
+        }
+    ),
+    # ==================== SHAREPOINT TOOLS ====================
+    Tool(
+        name="list_sites",
+        description="List SharePoint sites in the tenant. Optionally search by name.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "search": {
+                    "type": "string",
+                    "description": "Optional search term to filter sites by name"
                 },
-                "required": ["site_id"]
+                "fields": _FIELDS_SCHEMA
             }
-        ),
-    ]
+        }
+    ),
+    Tool(
+        name="get_site",
+        description="Get details for a specific SharePoint site by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                }
+            },
+            "required": ["site_id"]
+        }
+    ),
+    Tool(
+        name="get_site_by_url",
+        description="Get a SharePoint site by hostname and path",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "hostname": {
+                    "type": "string",
+                    "description": "The SharePoint hostname (e.g., contoso.sharepoint.com)"
+                },
+                "site_path": {
+                    "type": "string",
+                    "description": "The site path (e.g., sites/marketing)"
+                }
+            },
+            "required": ["hostname", "site_path"]
+        }
+    ),
+    Tool(
+        name="get_root_site",
+        description="Get the root SharePoint site for the tenant",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="list_site_permissions",
+        description="List all permissions on a SharePoint site",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                },
+                "fields": _FIELDS_SCHEMA
+            },
+            "required": ["site_id"]
+        }
+    ),
+    Tool(
+        name="add_site_permission",
+        description="Add a user permission to a SharePoint site",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                },
+                "user_id": {
+                    "type": "string",
+                    "description": "The user ID to grant access"
+                },
+                "role": {
+                    "type": "string",
+                    "enum": ["read", "write", "owner"],
+                    "description": "The permission level: read, write, or owner",
+                    "default": "write"
+                }
+            },
+            "required": ["site_id", "user_id"]
+        }
+    ),
+    Tool(
+        name="remove_site_permission",
+        description="Remove a permission from a SharePoint site",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                },
+                "permission_id": {
+                    "type": "string",
+                    "description": "The permission ID to remove"
+                }
+            },
+            "required": ["site_id", "permission_id"]
+        }
+    ),
+    Tool(
+        name="list_site_drives",
+        description="List document libraries in a SharePoint site",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                },
+                "fields": _FIELDS_SCHEMA
+            },
+            "required": ["site_id"]
+        }
+    ),
+    Tool(
+        name="list_site_lists",
+        description="List all lists in a SharePoint site",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "site_id": {
+                    "type": "string",
+                    "description": "The site ID"
+                },
+                "fields": _FIELDS_SCHEMA
+            },
+            "required": ["site_id"]
+        }
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools"""
+    return _TOOLS
 
 
-@app.call_tool()
+# Tool name -> (client method, result label, whether to include the Graph response)
+HANDLERS: dict[str, tuple[Callable[..., Awaitable[dict]], str, bool]] = {
+    # ==================== USER HANDLERS ====================
+    "create_user": (graph_client.create_user, "User created successfully", True),
+    "assign_license": (graph_client.assign_license, "License assigned successfully", True),
+    "add_user_to_group": (
+        graph_client.add_user_to_group, "User added to group successfully", False
+    ),
+    "remove_user_from_group": (
+        graph_client.remove_user_from_group, "User removed from group successfully", False
+    ),
+    "list_available_licenses": (graph_client.list_available_licenses, "Available licenses", True),
+    "list_groups": (graph_client.list_groups, "Groups", True),
+    "get_group_members": (graph_client.get_group_members, "Group members", True),
+    "bulk_get_group_members": (graph_client.bulk_get_group_members, "Group members", True),
+    "get_user": (graph_client.get_user, "User details", True),
+    "search_user": (graph_client.search_user, "Search results", True),
+    "list_users": (graph_client.list_users, "Users", True),
+    "bulk_add_users_to_group": (
+        graph_client.bulk_add_users_to_group, "Group membership results", True
+    ),
+    "bulk_get_users": (graph_client.bulk_get_users, "User details", True),
+    "bulk_assign_licenses": (graph_client.bulk_assign_licenses, "License assignment results", True),
+    # ==================== SHAREPOINT HANDLERS ====================
+    "list_sites": (graph_client.list_sites, "SharePoint sites", True),
+    "get_site": (graph_client.get_site, "Site details", True),
+    "get_site_by_url": (graph_client.get_site_by_url, "Site details", True),
+    "get_root_site": (graph_client.get_root_site, "Root site", True),
+    "list_site_permissions": (graph_client.list_site_permissions, "Site permissions", True),
+    "add_site_permission": (graph_client.add_site_permission, "Permission added", True),
+    "remove_site_permission": (
+        graph_client.remove_site_permission, "Permission removed successfully", False
+    ),
+    "list_site_drives": (graph_client.list_site_drives, "Document libraries", True),
+    "list_site_lists": (graph_client.list_site_lists, "Site lists", True),
+}
+
+
+# Argument validators generated once from the tool schemas. They replace the MCP
+# server's per-call jsonschema validation, and fill in schema defaults.
+_VALIDATORS = {tool.name: fastjsonschema.compile(tool.inputSchema) for tool in _TOOLS}
+# Argument names each tool accepts; anything else is ignored rather than passed on
+_ARGUMENT_NAMES = {
+    tool.name: frozenset(tool.inputSchema.get("properties", {})) for tool in _TOOLS
+}
+
+
+@app.call_tool(validate_input=False)
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Handle tool calls"""
+    entry = HANDLERS.get(name)
+    if entry is None:
+        return [TextContent(
+            type="text",
+            text=f"Unknown tool: {name}"
+        )]
+    
     try:
-        # ==================== USER HANDLERS ====================
-        if name == "create_user":
-            result = await graph_client.create_user(
-                display_name=arguments["display_name"],
-                user_principal_name=arguments["user_principal_name"],
-                mail_nickname=arguments["mail_nickname"],
-                password=arguments["password"],
-                account_enabled=arguments.get("account_enabled", True),
-                force_change_password=arguments.get("force_change_password", True)
-            )
-            return [TextContent(
-                type="text",
-                text=f"User created successfully:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "assign_license":
-            result = await graph_client.assign_license(
-                user_id=arguments["user_id"],
-                sku_id=arguments["sku_id"],
-                disabled_plans=arguments.get("disabled_plans", [])
-            )
-            return [TextContent(
-                type="text",
-                text=f"License assigned successfully:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "add_user_to_group":
-            result = await graph_client.add_user_to_group(
-                user_id=arguments["user_id"],
-                group_id=arguments["group_id"]
-            )
-            return [TextContent(
-                type="text",
-                text="User added to group successfully"
-            )]
-        
-        elif name == "remove_user_from_group":
-            result = await graph_client.remove_user_from_group(
-                user_id=arguments["user_id"],
-                group_id=arguments["group_id"]
-            )
-            return [TextContent(
-                type="text",
-                text="User removed from group successfully"
-            )]
-        
-        elif name == "list_available_licenses":
-            result = await graph_client.list_available_licenses()
-            return [TextContent(
-                type="text",
-                text=f"Available licenses:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "list_groups":
-            result = await graph_client.list_groups()
-            return [TextContent(
-                type="text",
-                text=f"Groups:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "get_group_members":
-            result = await graph_client.get_group_members(
-                group_id=arguments["group_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Group members:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "get_user":
-            result = await graph_client.get_user(
-                user_id=arguments["user_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"User details:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "search_user":
-            result = await graph_client.search_user(
-                search_term=arguments["search_term"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Search results:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "list_users":
-            result = await graph_client.list_users(
-                top=arguments.get("top", 100)
-            )
-            return [TextContent(
-                type="text",
-                text=f"Users:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        # ==================== SHAREPOINT HANDLERS ====================
-        elif name == "list_sites":
-            result = await graph_client.list_sites(
-                search=arguments.get("search")
-            )
-            return [TextContent(
-                type="text",
-                text=f"SharePoint sites:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "get_site":
-            result = await graph_client.get_site(
-                site_id=arguments["site_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Site details:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "get_site_by_url":
-            result = await graph_client.get_site_by_url(
-                hostname=arguments["hostname"],
-                site_path=arguments["site_path"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Site details:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "get_root_site":
-            result = await graph_client.get_root_site()
-            return [TextContent(
-                type="text",
-                text=f"Root site:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "list_site_permissions":
-            result = await graph_client.list_site_permissions(
-                site_id=arguments["site_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Site permissions:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "add_site_permission":
-            result = await graph_client.add_site_permission(
-                site_id=arguments["site_id"],
-                user_id=arguments["user_id"],
-                role=arguments.get("role", "write")
-            )
-            return [TextContent(
-                type="text",
-                text=f"Permission added:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "remove_site_permission":
-            result = await graph_client.remove_site_permission(
-                site_id=arguments["site_id"],
-                permission_id=arguments["permission_id"]
-            )
-            return [TextContent(
-                type="text",
-                text="Permission removed successfully"
-            )]
-        
-        elif name == "list_site_drives":
-            result = await graph_client.list_site_drives(
-                site_id=arguments["site_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Document libraries:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        elif name == "list_site_lists":
-            result = await graph_client.list_site_lists(
-                site_id=arguments["site_id"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"Site lists:\n{json.dumps(result, indent=2)}"
-            )]
-        
-        else:
-            return [TextContent(
-                type="text",
-                text=f"Unknown tool: {name}"
-            )]
+        arguments = _VALIDATORS[name](arguments or {})
+    except fastjsonschema.JsonSchemaException as e:
+        return [TextContent(
+            type="text",
+            text=f"Invalid arguments: {e.message}"
+        )]
     
+    allowed = _ARGUMENT_NAMES[name]
+    handler, label, show_result = entry
+    try:
+        result = await handler(**{k: v for k, v in arguments.items() if k in allowed})
     except Exception as e:
         return [TextContent(
             type="text",
             text=f"Error: {str(e)}"
         )]
+    
+    if not show_result:
+        return [TextContent(type="text", text=label)]
+    return _ok(label, result)
 
 
 async def main():
     """Run the MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    # Prime the token cache and connection pool in the background so tool calls
+    # don't pay for token acquisition and the TLS handshake, without delaying startup.
+    # It keeps them warm afterwards only if MICROSOFT_GRAPH_KEEP_WARM_SECONDS is set.
+    warm_task = asyncio.create_task(graph_client.keep_warm())
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        warm_task.cancel()
+        # Let an in-flight warm-up request finish unwinding before the pool closes
+        await asyncio.gather(warm_task, return_exceptions=True)
+        await graph_client.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
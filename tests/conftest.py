@@ -0,0 +1,79 @@
+import os
+import sys
+
+import httpx
+import msal
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MICROSOFT_TENANT_ID", "test-tenant")
+os.environ.setdefault("MICROSOFT_CLIENT_ID", "test-client")
+os.environ.setdefault("MICROSOFT_CLIENT_SECRET", "test-secret")
+os.environ.pop("MICROSOFT_TOKEN_CACHE_PATH", None)
+
+
+class FakeConfidentialClientApplication:
+    """Stands in for MSAL so tests never contact login.microsoftonline.com"""
+
+    def __init__(self, *args, token_cache=None, **kwargs):
+        self.token_cache = token_cache
+        self.token_requests = 0
+        # What acquire_token_for_client returns; tests may replace it
+        self.result = {"access_token": "test-token", "expires_in": 3600}
+
+    def acquire_token_for_client(self, scopes):
+        self.token_requests += 1
+        if self.token_cache is not None:
+            # MSAL marks its cache as changed when it stores a new token
+            self.token_cache.has_state_changed = True
+        return dict(self.result)
+
+
+# The server module builds a GraphAPIClient at import time
+msal.ConfidentialClientApplication = FakeConfidentialClientApplication
+
+import mcp_graph_server  # noqa: E402
+
+
+class GraphMock:
+    """Records requests and answers them with a test-provided handler"""
+
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        self.handler = lambda request: httpx.Response(200, json={})
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.handler(request)
+
+
+@pytest.fixture
+def graph():
+    return GraphMock()
+
+
+@pytest.fixture
+async def client(graph, monkeypatch):
+    """GraphAPIClient whose HTTP traffic goes to the graph mock, without retry jitter"""
+    monkeypatch.setattr(mcp_graph_server.random, "uniform", lambda a, b: 0.0)
+    client = mcp_graph_server.GraphAPIClient()
+    await client._client.aclose()
+    client._client = httpx.AsyncClient(
+        base_url=client.graph_endpoint,
+        transport=httpx.MockTransport(graph)
+    )
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+async def server_graph(graph, monkeypatch):
+    """Route the server's module-level GraphAPIClient to the graph mock"""
+    mock_client = httpx.AsyncClient(
+        base_url=mcp_graph_server.graph_client.graph_endpoint,
+        transport=httpx.MockTransport(graph)
+    )
+    monkeypatch.setattr(mcp_graph_server.graph_client, "_client", mock_client)
+    yield graph
+    await mock_client.aclose()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import httpx
+
+
+def batch_requests(request: httpx.Request) -> list[dict]:
+    return json.loads(request.content)["requests"]
+
+
+# ==================== $BATCH COALESCING ====================
+
+async def test_concurrent_writes_are_coalesced_into_one_batch(client, graph):
+    def handler(request):
+        assert request.url.path == "/v1.0/$batch"
+        # Answer out of order to check responses are matched by id
+        return httpx.Response(200, json={"responses": [
+            {"id": r["id"], "status": 200, "body": {"url": r["url"]}}
+            if r["method"] == "POST" and r["url"].endswith("assignLicense")
+            else {"id": r["id"], "status": 204}
+            for r in reversed(batch_requests(request))
+        ]})
+    graph.handler = handler
+
+    added, removed, licensed = await asyncio.gather(
+        client.add_user_to_group("u1", "g1"),
+        client.remove_user_from_group("u2", "g1"),
+        client.assign_license("u3", "sku")
+    )
+
+    assert len(graph.requests) == 1
+    sent = batch_requests(graph.requests[0])
+    assert [r["url"] for r in sent] == [
+        "/groups/g1/members/$ref",
+        "/groups/g1/members/u2/$ref",
+        "/users/u3/assignLicense",
+    ]
+    assert sent[0]["headers"] == {"Content-Type": "application/json"}
+    assert "body" not in sent[1]
+    assert added == {"status": 204}
+    assert removed == {"status": 204}
+    assert licensed == {"url": "/users/u3/assignLicense"}
+
+
+async def test_lone_write_is_sent_directly(client, graph):
+    graph.handler = lambda request: httpx.Response(201, json={"id": "new-user"})
+
+    result = await client.create_user("Name", "name@contoso.com", "name", "pw")
+
+    assert result == {"id": "new-user"}
+    assert len(graph.requests) == 1
+    assert graph.requests[0].method == "POST"
+    assert graph.requests[0].url.path == "/v1.0/users"
+
+
+async def test_failed_sub_response_only_fails_its_caller(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"responses": [
+        {"id": "0", "status": 204},
+        {"id": "1", "status": 404, "body": {"error": {"message": "Group not found"}}},
+    ]})
+
+    ok, failed = await asyncio.gather(
+        client.add_user_to_group("u1", "g1"),
+        client.add_user_to_group("u2", "missing"),
+        return_exceptions=True
+    )
+
+    assert ok == {"status": 204}
+    assert isinstance(failed, Exception)
+    assert "404" in str(failed) and "Group not found" in str(failed)
+
+
+async def test_more_than_twenty_writes_are_split(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"responses": [
+        {"id": r["id"], "status": 204} for r in batch_requests(request)
+    ]})
+
+    await asyncio.gather(*(client.add_user_to_group(f"u{i}", "g") for i in range(25)))
+
+    sizes = sorted(len(batch_requests(r)) for r in graph.requests)
+    assert sizes == [5, 20]
+
+
+# ==================== BULK TOOLS ====================
+
+async def test_bulk_get_users_maps_results_to_ids(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"responses": [
+        {"id": "1", "status": 404, "body": {"error": {"message": "User not found"}}},
+        {"id": "0", "status": 200, "body": {"id": "a"}},
+    ]})
+
+    result = await client.bulk_get_users(["a", "b"])
+
+    assert result == {"results": [
+        {"id": "a", "status": 200, "result": {"id": "a"}},
+        {"id": "b", "status": 404, "error": "User not found"},
+    ]}
+    assert [r["url"] for r in batch_requests(graph.requests[0])] == ["/users/a", "/users/b"]
+
+
+async def test_bulk_tool_reports_items_of_a_failed_chunk(client, graph):
+    def handler(request):
+        sent = batch_requests(request)
+        if len(sent) == 5:
+            return httpx.Response(400, json={"error": {"message": "Bad batch"}})
+        return httpx.Response(200, json={"responses": [
+            {"id": r["id"], "status": 204} for r in sent
+        ]})
+    graph.handler = handler
+
+    result = await client.bulk_add_users_to_group("g", [f"u{i}" for i in range(25)])
+
+    statuses = [entry["status"] for entry in result["results"]]
+    assert statuses == [204] * 20 + [400] * 5
+    assert result["results"][-1]["error"] == "Bad batch"
+
+
+async def test_batch_retries_only_safe_sub_requests(client, graph):
+    def handler(request):
+        sent = batch_requests(request)
+        if len(graph.requests) == 1:
+            return httpx.Response(200, json={"responses": [
+                {"id": "0", "status": 429, "headers": {"Retry-After": "0"}},
+                {"id": "1", "status": 504},
+                {"id": "2", "status": 504, "headers": {"Retry-After": "0"}},
+            ]})
+        return httpx.Response(200, json={"responses": [
+            {"id": r["id"], "status": 200, "body": {"url": r["url"]}} for r in sent
+        ]})
+    graph.handler = handler
+
+    responses = await client._batch([
+        {"method": "POST", "url": "users/a/assignLicense", "body": {}},
+        {"method": "POST", "url": "users/b/assignLicense", "body": {}},
+        {"method": "GET", "url": "users/c"},
+    ])
+
+    assert len(graph.requests) == 2
+    assert [r["url"] for r in batch_requests(graph.requests[1])] == [
+        "/users/a/assignLicense",
+        "/users/c",
+    ]
+    assert [r["status"] for r in responses] == [200, 504, 200]
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import mcp_graph_server
+
+
+# ==================== QUERY BUILDING ====================
+
+def test_search_term_escapes_backslashes_before_quotes():
+    assert mcp_graph_server._escape_search('a\\b"c\\') == 'a\\\\b\\"c\\\\'
+
+
+async def test_search_user_sends_escaped_term(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"value": []})
+
+    await client.search_user('a\\b"c')
+
+    search = graph.requests[0].url.params["$search"]
+    assert search == '"displayName:a\\\\b\\"c" OR "userPrincipalName:a\\\\b\\"c"'
+    assert graph.requests[0].headers["ConsistencyLevel"] == "eventual"
+
+
+# ==================== ETAG CACHE ====================
+
+async def test_etag_revalidation_reuses_cached_body(client, graph):
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"id": "u1"}, headers={"ETag": '"v1"'})
+    graph.handler = handler
+
+    first = await client.get_user("u1")
+    second = await client.get_user("u1")
+
+    assert first == second == {"id": "u1"}
+    assert "If-None-Match" not in graph.requests[0].headers
+    assert graph.requests[1].headers["If-None-Match"] == '"v1"'
+
+
+async def test_etag_cache_is_keyed_by_query(client, graph):
+    graph.handler = lambda request: httpx.Response(
+        200, json={"select": request.url.params.get("$select")}, headers={"ETag": '"v1"'}
+    )
+
+    await client.get_user("u1", fields=["id"])
+    await client.get_user("u1", fields=["mail"])
+
+    assert "If-None-Match" not in graph.requests[1].headers
+
+
+async def test_etag_cache_is_bounded(client, graph, monkeypatch):
+    monkeypatch.setattr(mcp_graph_server, "ETAG_CACHE_SIZE", 2)
+    graph.handler = lambda request: httpx.Response(200, json={}, headers={"ETag": '"v1"'})
+
+    for user_id in ("u1", "u2", "u3"):
+        await client.get_user(user_id)
+
+    assert len(client._etag_cache) == 2
+
+
+# ==================== URL ENCODING ====================
+
+async def test_user_id_is_percent_encoded(client, graph):
+    await client.get_user("a/b?c#d@contoso.com")
+
+    assert graph.requests[0].url.raw_path == b"/v1.0/users/a%2Fb%3Fc%23d%40contoso.com"
+
+
+async def test_site_id_keeps_separators(client, graph):
+    await client.get_site("contoso.sharepoint.com,1234,5678")
+    await client.get_site("contoso.sharepoint.com:/sites/my site")
+
+    assert graph.requests[0].url.raw_path == b"/v1.0/sites/contoso.sharepoint.com,1234,5678"
+    assert graph.requests[1].url.raw_path == (
+        b"/v1.0/sites/contoso.sharepoint.com:/sites/my%20site"
+    )
+
+
+async def test_group_write_ids_are_percent_encoded(client, graph):
+    graph.handler = lambda request: httpx.Response(204)
+
+    await client.add_user_to_group("user/1", "group/1")
+
+    request = graph.requests[0]
+    assert request.url.raw_path == b"/v1.0/groups/group%2F1/members/$ref"
+    assert json.loads(request.content) == {
+        "@odata.id": "https://graph.microsoft.com/v1.0/directoryObjects/user%2F1"
+    }
+
+
+# ==================== PAGING ====================
+
+def paged_users(request):
+    skip = int(request.url.params.get("skip", "0"))
+    page = {"value": [{"id": f"u{i}"} for i in range(skip, skip + 2)]}
+    if skip < 4:
+        page["@odata.nextLink"] = f"https://graph.microsoft.com/v1.0/users?skip={skip + 2}"
+    return httpx.Response(200, json=page)
+
+
+async def test_paging_follows_next_link(client, graph):
+    graph.handler = paged_users
+
+    result = await client.list_users(top=999)
+
+    assert [user["id"] for user in result["value"]] == [f"u{i}" for i in range(6)]
+    assert "@odata.nextLink" not in result
+    assert len(graph.requests) == 3
+    assert all(
+        r.headers["Prefer"] == "odata.maxpagesize=999" for r in graph.requests
+    )
+
+
+async def test_paging_stops_at_limit(client, graph):
+    graph.handler = paged_users
+
+    result = await client.list_users(top=3)
+
+    assert [user["id"] for user in result["value"]] == ["u0", "u1", "u2"]
+    assert len(graph.requests) == 2
+    assert graph.requests[0].url.params["$top"] == "3"
+
+
+async def test_list_groups_returns_every_page(client, graph):
+    graph.handler = paged_users
+
+    result = await client.list_groups()
+
+    assert len(result["value"]) == 6
+    assert graph.requests[0].url.params["$top"] == "999"
+
+
+# ==================== KEEP WARM ====================
+
+async def test_keep_warm_runs_once_by_default(client, graph):
+    await asyncio.wait_for(client.keep_warm(), timeout=1)
+
+    assert len(graph.requests) == 1
+    assert graph.requests[0].url.path == "/v1.0/organization"
+
+
+async def test_keep_warm_repeats_with_an_interval(client, graph):
+    task = asyncio.create_task(client.keep_warm(interval=0.01))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert len(graph.requests) > 1
+
+
+async def test_keep_warm_ignores_errors(client, graph):
+    graph.handler = lambda request: httpx.Response(401)
+
+    await asyncio.wait_for(client.keep_warm(), timeout=1)
+
+
+# ==================== RETRIES ====================
+
+async def test_throttled_write_is_retried(client, graph):
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(201, json={"id": "new-user"}),
+    ])
+    graph.handler = lambda request: next(responses)
+
+    result = await client.create_user("Name", "name@contoso.com", "name", "pw")
+
+    assert result == {"id": "new-user"}
+    assert len(graph.requests) == 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+async def test_server_error_on_write_is_not_retried(client, graph, status):
+    graph.handler = lambda request: httpx.Response(status, headers={"Retry-After": "0"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.create_user("Name", "name@contoso.com", "name", "pw")
+
+    assert len(graph.requests) == 1
+
+
+@pytest.mark.parametrize("status", [500, 504])
+async def test_server_error_on_read_is_retried(client, graph, status):
+    responses = iter([
+        httpx.Response(status, headers={"Retry-After": "0"}),
+        httpx.Response(200, json={"id": "u1"}),
+    ])
+    graph.handler = lambda request: next(responses)
+
+    assert await client.get_user("u1") == {"id": "u1"}
+    assert len(graph.requests) == 2
+
+
+async def test_client_error_is_not_retried(client, graph):
+    graph.handler = lambda request: httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_user("u1")
+
+    assert len(graph.requests) == 1
+
+
+async def test_retries_are_bounded(client, graph):
+    graph.handler = lambda request: httpx.Response(503, headers={"Retry-After": "0"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_user("u1")
+
+    assert len(graph.requests) == mcp_graph_server.MAX_RETRIES + 1
+
+
+async def test_low_rate_limit_quota_pauses_requests(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={}, headers={
+        "RateLimit-Limit": "100", "RateLimit-Remaining": "5", "RateLimit-Reset": "30"
+    })
+
+    await client.get_user("u1")
+
+    assert client._throttled_until > time.monotonic() + 25
+
+
+# ==================== FIELD SELECTION ====================
+
+async def test_list_users_selects_default_fields(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"value": []})
+
+    await client.list_users()
+
+    assert graph.requests[0].url.params["$select"] == (
+        "id,displayName,userPrincipalName,mail,jobTitle"
+    )
+
+
+async def test_list_tools_select_requested_fields(client, graph):
+    graph.handler = lambda request: httpx.Response(200, json={"value": []})
+
+    await client.list_users(fields=["id", "mail"])
+    await client.get_group_members("g1", fields=["id"])
+    await client.list_site_drives("s1", fields=["name"])
+
+    assert [r.url.params["$select"] for r in graph.requests] == ["id,mail", "id", "name"]
+
+
+async def test_get_user_without_fields_returns_default_properties(client, graph):
+    await client.get_user("u1")
+
+    assert "$select" not in graph.requests[0].url.params
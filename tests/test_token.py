@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import mcp_graph_server
+
+
+async def test_token_is_cached_until_refresh(client):
+    before = time.monotonic()
+    assert await client.get_token() == "test-token"
+    assert await client.get_token() == "test-token"
+
+    assert client.app.token_requests == 1
+    assert client._headers["Authorization"] == "Bearer test-token"
+    # Refreshed a minute before expiry
+    assert before + 3540 <= client._token_refresh_at <= time.monotonic() + 3540
+
+
+async def test_expired_token_is_refreshed(client):
+    await client.get_token()
+    client._token_refresh_at = 0.0
+    client.app.result = {"access_token": "new-token", "expires_in": 3600}
+
+    assert await client.get_token() == "new-token"
+    assert client.app.token_requests == 2
+    assert client._headers["Authorization"] == "Bearer new-token"
+
+
+async def test_concurrent_callers_share_one_token_request(client):
+    tokens = await asyncio.gather(*(client.get_token() for _ in range(10)))
+
+    assert set(tokens) == {"test-token"}
+    assert client.app.token_requests == 1
+
+
+async def test_token_failure_is_reported(client):
+    client.app.result = {"error": "invalid_client", "error_description": "Bad secret"}
+
+    with pytest.raises(Exception, match="Bad secret"):
+        await client.get_token()
+
+    client.app.result = {"access_token": "test-token", "expires_in": 3600}
+    assert await client.get_token() == "test-token"
+
+
+async def test_refresh_in_hint_brings_refresh_forward(client):
+    client.app.result = {"access_token": "test-token", "expires_in": 3600, "refresh_in": 600}
+    before = time.monotonic()
+
+    await client.get_token()
+
+    assert before + 600 <= client._token_refresh_at <= time.monotonic() + 600
+
+
+async def test_refresh_in_later_than_expiry_is_ignored(client):
+    client.app.result = {"access_token": "test-token", "expires_in": 300, "refresh_in": 1800}
+    before = time.monotonic()
+
+    await client.get_token()
+
+    assert before + 240 <= client._token_refresh_at <= time.monotonic() + 240
+
+
+# ==================== PERSISTENT CACHE ====================
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "token_cache.json"
+    monkeypatch.setenv("MICROSOFT_TOKEN_CACHE_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+async def new_client(cache_path):
+    """Build GraphAPIClients that use cache_path, closing them after the test"""
+    clients = []
+
+    def new_client():
+        clients.append(mcp_graph_server.GraphAPIClient())
+        return clients[-1]
+    yield new_client
+    for client in clients:
+        await client.aclose()
+
+
+async def test_token_cache_is_saved(new_client, cache_path):
+    client = new_client()
+
+    await client.get_token()
+
+    assert json.loads(cache_path.read_text()) == json.loads(client.token_cache.serialize())
+    assert not client.token_cache.has_state_changed
+    # Only the cache file is left behind, not the temporary file it was written to
+    assert os.listdir(cache_path.parent) == [cache_path.name]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file permissions")
+async def test_token_cache_is_private(new_client, cache_path):
+    cache_path.write_text("{}")
+    cache_path.chmod(0o644)
+    client = new_client()
+
+    await client.get_token()
+
+    assert stat.S_IMODE(cache_path.stat().st_mode) == 0o600
+
+
+async def test_token_cache_is_saved_without_fchmod(new_client, cache_path, monkeypatch):
+    # os.fchmod does not exist on Windows before Python 3.13
+    monkeypatch.delattr(os, "fchmod", raising=False)
+    client = new_client()
+
+    assert await client.get_token() == "test-token"
+    assert cache_path.exists()
+
+
+async def test_corrupt_token_cache_is_replaced(new_client, cache_path):
+    cache_path.write_text('{"AccessToken": {')
+    client = new_client()
+
+    assert await client.get_token() == "test-token"
+    json.loads(cache_path.read_text())
+
+
+async def test_save_failure_does_not_break_token_acquisition(new_client, monkeypatch):
+    client = new_client()
+
+    def fail():
+        raise AttributeError("cannot save")
+    monkeypatch.setattr(client, "_save_token_cache", fail)
+
+    assert await client.get_token() == "test-token"
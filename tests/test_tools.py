@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+import mcp_graph_server
+
+
+async def test_call_tool_dispatches_to_handler(server_graph):
+    server_graph.handler = lambda request: httpx.Response(200, json={"id": "u1"})
+
+    result = await mcp_graph_server.call_tool("get_user", {"user_id": "u1"})
+
+    assert result[0].text == 'User details:\n{"id":"u1"}'
+    assert server_graph.requests[0].url.path == "/v1.0/users/u1"
+
+
+async def test_call_tool_ignores_unknown_arguments(server_graph):
+    server_graph.handler = lambda request: httpx.Response(200, json={"id": "u1"})
+
+    result = await mcp_graph_server.call_tool("get_user", {"user_id": "u1", "extra": 1})
+
+    assert result[0].text == 'User details:\n{"id":"u1"}'
+
+
+async def test_call_tool_reports_unknown_tool():
+    result = await mcp_graph_server.call_tool("no_such_tool", {})
+
+    assert result[0].text == "Unknown tool: no_such_tool"
+
+
+async def test_call_tool_reports_handler_errors(server_graph):
+    server_graph.handler = lambda request: httpx.Response(
+        404, json={"error": {"message": "Not found"}}
+    )
+
+    result = await mcp_graph_server.call_tool("get_user", {"user_id": "u1"})
+
+    assert result[0].text.startswith("Error: ")
+
+
+def test_every_tool_has_a_handler():
+    assert {tool.name for tool in mcp_graph_server._TOOLS} == set(mcp_graph_server.HANDLERS)
+
+
+async def test_call_tool_rejects_invalid_arguments():
+    result = await mcp_graph_server.call_tool("list_users", {"top": "ten"})
+
+    assert result[0].text.startswith("Invalid arguments:")
+
+
+def test_validators_fill_schema_defaults():
+    assert mcp_graph_server._VALIDATORS["list_users"]({}) == {"top": 100}
+
+
+async def test_main_stops_warm_up_before_closing_the_client(monkeypatch):
+    events = []
+
+    async def keep_warm():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("warm-up stopped")
+            raise
+
+    async def aclose():
+        events.append("client closed")
+
+    @asynccontextmanager
+    async def stdio_server():
+        yield None, None
+
+    async def run(*args):
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(mcp_graph_server.graph_client, "keep_warm", keep_warm)
+    monkeypatch.setattr(mcp_graph_server.graph_client, "aclose", aclose)
+    monkeypatch.setattr(mcp_graph_server, "stdio_server", stdio_server)
+    monkeypatch.setattr(mcp_graph_server.app, "run", run)
+
+    await mcp_graph_server.main()
+
+    assert events == ["warm-up stopped", "client closed"]
+
+
+async def test_call_tool_passes_fields_through(server_graph):
+    server_graph.handler = lambda request: httpx.Response(200, json={"value": []})
+
+    await mcp_graph_server.call_tool("list_site_lists", {"site_id": "s1", "fields": ["id"]})
+
+    assert server_graph.requests[0].url.params["$select"] == "id"